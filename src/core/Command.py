@@ -1,3 +1,4 @@
+import struct
 import SerialMessageHandler
 import Utils
 
@@ -7,6 +8,30 @@ GPIO_COMMAND = 0x01
 LED_COMMAND = 0x02
 TURRET_COMMAND = 0x03
 
+# Command identifiers as the single-byte values send_data expects
+_HANDSHAKE_ID = b"\xff"
+_GPIO_ID = b"\x01"
+_LED_ID = b"\x02"
+_TURRET_ID = b"\x03"
+
+# Packs a single-byte-payload frame (start, length, command, payload, checksum) in one C call
+_HS_PACKER = struct.Struct(">BBBBB").pack
+
+def build_handshake_frame(value: int):
+    """
+    Build a complete handshake frame carrying a single payload byte
+    
+    Args:
+        value: The handshake payload byte
+        
+    Returns:
+        bytes: start, length, command, payload and checksum ready to be written
+    """
+    return _HS_PACKER(0xAA, 5, HANDSHAKE_COMMAND, value, 0xAA ^ 5 ^ HANDSHAKE_COMMAND ^ value)
+
+# Pre-built initial handshake request frame (0x00 payload)
+HANDSHAKE_INIT_FRAME = build_handshake_frame(0x00)
+
 def send_handshake(payload: bytes, handler):
     """
     Send a handshake command with the given payload
@@ -18,8 +43,16 @@ def send_handshake(payload: bytes, handler):
                 - 0xAA for acknowledge
         handler: The SerialMessageHandler to send the command through
     """
-    command_id = bytes([HANDSHAKE_COMMAND])
-    handler.send_data(command_id, payload)
+    handler.send_data(_HANDSHAKE_ID, payload)
+    
+def send_handshake_raw(handler):
+    """
+    Send the pre-built initial handshake request (0x00 payload) as a single write
+    
+    Args:
+        handler: The SerialMessageHandler to send the command through
+    """
+    handler.send_raw_data(HANDSHAKE_INIT_FRAME)
     
 def send_gpio_command(pin: int, state: int, handler):
     """
@@ -30,9 +63,8 @@ def send_gpio_command(pin: int, state: int, handler):
         state: The state to set (0=LOW, 1=HIGH)
         handler: The SerialMessageHandler to send the command through
     """
-    command_id = bytes([GPIO_COMMAND])
     payload = bytes([pin, state])
-    handler.send_data(command_id, payload)
+    handler.send_data(_GPIO_ID, payload)
     
 def send_led_command(brightness: int, handler):
     """
@@ -42,9 +74,8 @@ def send_led_command(brightness: int, handler):
         brightness: Brightness value (0-255)
         handler: The SerialMessageHandler to send the command through
     """
-    command_id = bytes([LED_COMMAND])
     payload = bytes([brightness])
-    handler.send_data(command_id, payload)
+    handler.send_data(_LED_ID, payload)
     
 def send_turret_command(angle: int, power: int, handler):
     """
@@ -55,6 +86,5 @@ def send_turret_command(angle: int, power: int, handler):
         power: Power value (0-100)
         handler: The SerialMessageHandler to send the command through
     """
-    command_id = bytes([TURRET_COMMAND])
     payload = bytes([angle, power])
-    handler.send_data(command_id, payload)
\ No newline at end of file
+    handler.send_data(_TURRET_ID, payload)
\ No newline at end of file
@@ -1,9 +1,78 @@
 import serial
 import serial.tools.list_ports
 import time
+import threading
+import concurrent.futures
+import json
+import os
+import logging
+from dataclasses import dataclass, field
+from typing import Any, Optional
 import Command
 from SerialMessageHandler import SerialMessageHandler, ConnectionStatus
 
+# Module-level aliases so status checks are a global load and an identity test
+_CS_NOT_CONNECTED = ConnectionStatus.NOT_CONNECTED
+_CS_CONNECTED = ConnectionStatus.CONNECTED
+_CS_IN_PROGRESS = ConnectionStatus.IN_PROGRESS
+
+log = logging.getLogger(__name__)
+
+
+def _load_port_cache(path):
+    """Load the saved {device_name: port} mapping, or an empty dict if there is none"""
+    try:
+        with open(path) as f:
+            cache = json.load(f)
+    except FileNotFoundError:
+        return {}
+    except (OSError, ValueError) as e:
+        log.warning("Could not read port cache %s: %s", path, e)
+        return {}
+    if not isinstance(cache, dict):
+        return {}
+    # Ignore entries that are not a plain port name, e.g. from a hand-edited file
+    return {name: port for name, port in cache.items() if isinstance(port, str)}
+
+
+def _save_port_cache(path, cache):
+    """Save the {device_name: port} mapping; a failure is reported but not raised since the cache is only a hint"""
+    try:
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(path, "w") as f:
+            json.dump(cache, f)
+    except OSError as e:
+        log.warning("Could not write port cache %s: %s", path, e)
+
+
+@dataclass(slots=True, eq=False)
+class DeviceRecord:
+    """
+    Connection state for a single managed device.
+    Slotted so status checks on the handshake path are plain attribute reads.
+    
+    Args:
+        id: Device identifier (int, or a single byte which is stored as its int value)
+        device_name: Name the device is registered under
+    """
+    id: int
+    device_name: Optional[str] = None
+    connection_status: ConnectionStatus = ConnectionStatus.NOT_CONNECTED
+    port_number: str = "NULL"
+    thread: Any = None
+    handler: Any = None
+    echo_frame: bytes = field(init=False, repr=False)  # Phase 3 handshake reply
+    
+    def __post_init__(self):
+        # The handshake reports the ID as an int, so normalise a one-byte ID such as b"\x05"
+        if isinstance(self.id, (bytes, bytearray)):
+            if len(self.id) != 1:
+                raise ValueError(f"Device ID must be a single byte, got {self.id!r}")
+            self.id = self.id[0]
+        self.echo_frame = Command.build_handshake_frame(self.id)
+
 
 class DeviceManager:
     """
@@ -11,17 +80,41 @@ class DeviceManager:
     This class handles device discovery, connection, and disconnection.
     """
     
-    def __init__(self, devices_dict=None):
+    # Minimum time between handshake requests to the same port (seconds)
+    HANDSHAKE_RESEND_INTERVAL = 2.0
+    # Longest a polling round waits for its handshake writes to finish (seconds)
+    HANDSHAKE_WRITE_TIMEOUT = 0.5
+    # How long remembered ports are asked on their own before the other ports are tried (seconds);
+    # longer than the handler's 0.5 s settle delay after opening, so a reply has time to be read
+    KNOWN_PORT_HEAD_START = 1.0
+    # Polling interval during the head start, so a remembered port is asked as soon as it opens (seconds)
+    KNOWN_PORT_POLL_INTERVAL = 0.05
+    
+    def __init__(self, devices_dict=None, debug=False, port_cache_file=None):
         """
         Initialize the device manager with a device dictionary.
         
         Args:
             devices_dict: Dictionary of devices to manage. If None, no devices will be managed.
-                          Format: {"device_name": {"id": byte_id, "connection_status": ConnectionStatus,
-                                                 "port_number": str, "thread": Thread, "handler": SerialMessageHandler}}
+                          Format: {"device_name": DeviceRecord(byte_id)}
+            debug: Enable debug logging on the serial handlers created during discovery
+            port_cache_file: Optional JSON file to remember each device's port in, so later
+                             scans ask those ports first. Nothing is written when None.
         """
         self.devices = devices_dict if devices_dict is not None else {}
         self.handlers = []  # List of all active SerialMessageHandlers
+        self.debug = debug
+        self.port_cache_file = port_cache_file
+        self._progress_event = threading.Event()  # Set whenever a device's handshake status changes
+        self._last_handshake_sent = {}  # Port -> time the last handshake request was sent
+        self._connected_names = set()  # Names of devices that completed their handshake
+        # Guards handshake status transitions, which run on every port's reader thread
+        self._registry_lock = threading.RLock()
+        
+        # Lookup table from device ID to device name for handshake processing
+        self._id_index = {}
+        for name, device_info in self.devices.items():
+            self._index_device(name, device_info)
         
     def register_device(self, name, device_id):
         """
@@ -29,40 +122,96 @@ class DeviceManager:
         
         Args:
             name: Device name (string)
-            device_id: Device identifier (byte or int)
+            device_id: Device identifier (int, or a single byte)
             
         Returns:
             True if device was registered, False if a device with that name already exists
         """
         if name in self.devices:
-            print(f"Device {name} already registered")
+            log.info("Device %s already registered", name)
             return False
             
-        self.devices[name] = {
-            "id": device_id,
-            "connection_status": ConnectionStatus.NOT_CONNECTED,
-            "port_number": "NULL",
-            "thread": None,
-            "handler": None
-        }
+        self.devices[name] = DeviceRecord(device_id, name)
+        self._index_device(name, self.devices[name])
         return True
+    
+    def _make_handler(self, port_device):
+        """
+        Create a handler for a port and register the handshake command on it.
+        The handler opens the port on its own thread, so this returns immediately.
+        
+        Args:
+            port_device: The serial port device name (e.g. "COM3")
+            
+        Returns:
+            The new SerialMessageHandler
+        """
+        handler = SerialMessageHandler(port_device, 115200, debug=self.debug)
+        # The bound method already carries 'self', so it can be registered directly
+        handler.register_command(Command.HANDSHAKE_COMMAND, self.send_handshake_response)
+        handler.on_disconnect = self._handler_disconnected
+        return handler
+    
+    def _broadcast_handshakes(self, send_pool, handlers):
+        """
+        Send the initial handshake request to each handler concurrently through the send pool.
+        Waits briefly for the writes so a port stuck in write() cannot stall the polling loop.
+        
+        Args:
+            send_pool: The discovery run's ThreadPoolExecutor
+            handlers: The handlers to send the request to
+        """
+        futures = [send_pool.submit(Command.send_handshake_raw, handler) for handler in handlers]
+        concurrent.futures.wait(futures, timeout=self.HANDSHAKE_WRITE_TIMEOUT)
+    
+    def _needs_handshake(self, handler, now):
+        """Check whether a handshake request should be sent to a handler's port"""
+        # Skip handlers whose device is connected. A device still IN_PROGRESS is only held off
+        # by the resend interval below, so a lost phase 3 or 4 frame gets a fresh request
+        if handler.device_name is not None and handler.device_name in self.devices:
+            if self.devices[handler.device_name].connection_status is _CS_CONNECTED:
+                return False
+        
+        # Skip ports that are not open (still opening, failed to open or waiting to reconnect);
+        # a write there can only fail, and leaving the timestamp unset lets them be tried once they open
+        connection = handler.serial_connection
+        if connection is None or not connection.is_open:
+            return False
+        
+        # Back off so a port is not sent a new request while it may still be answering the last one
+        return now - self._last_handshake_sent.get(handler.port, 0) >= self.HANDSHAKE_RESEND_INTERVAL
+    
+    def _index_device(self, name, device_info):
+        """Add a device to the ID lookup table"""
+        self._id_index[device_info.id] = name
+        device_info.device_name = name
         
     def get_device_handler(self, name):
         """Get the handler for a specific device"""
         if name not in self.devices:
             return None
-        return self.devices[name].get("handler")
+        return self.devices[name].handler
         
     def is_device_connected(self, name):
         """Check if a device is connected"""
         if name not in self.devices:
             return False
-        return self.devices[name].get("connection_status") == ConnectionStatus.CONNECTED
+        return self.devices[name].connection_status is _CS_CONNECTED
     
     def get_connected_devices(self):
         """Get dictionary of connected devices"""
-        return {name: info for name, info in self.devices.items() 
-                if info.get("connection_status") == ConnectionStatus.CONNECTED}
+        connected = {}
+        # Prune under the registry lock so a handshake completing on a reader thread cannot
+        # add the name back between the status check and the discard
+        with self._registry_lock:
+            for name in list(self._connected_names):
+                info = self.devices[name]
+                if info.connection_status is _CS_CONNECTED:
+                    connected[name] = info
+                else:
+                    # Handler dropped the connection on its own (e.g. serial error)
+                    self._connected_names.discard(name)
+        return connected
     
     def send_handshake_response(self, handler, payload):
         """
@@ -72,66 +221,213 @@ class DeviceManager:
         3. PC responds with 0xFF and echoes back the device ID it received
         4. Arduino responds with 0xFF and payload 0xAA for success or 0xFF for failure
         """
-        handler.log(f"Processing handshake response with payload: {[hex(b) for b in payload]}")
+        if handler.debug:
+            handler.log("Processing handshake response with payload: %s", payload.hex(' '))
         
         if len(payload) < 1:
             handler.log("Invalid handshake payload length")
             return
             
         received_value = payload[0]
-        handler.log(f"Received value: {hex(received_value)}")
+        handler.log("Received value: %#x", received_value)
         
         # Phase 2: Arduino responded with its device ID
-        device_ids = [device_info["id"] for device_name, device_info in self.devices.items()]
-        if received_value in device_ids:
-            # Find which device this ID belongs to
-            for device_name, device_info in self.devices.items():
-                if received_value == device_info["id"]:
-                    handler.log(f"Identified device: {device_name} with ID: {hex(received_value)}")
-                    
-                    # Update device status to in-progress
-                    device_info["connection_status"] = ConnectionStatus.IN_PROGRESS
-                    device_info["port_number"] = handler.port
-                    device_info["thread"] = handler.thread
-                    device_info["handler"] = handler
-                    
-                    # Associate this handler with the device
-                    handler.set_device(device_name, device_info)
-                    
-                    # Phase 3: Echo back the device ID using Command.py
-                    handler.log(f"Sending back device ID: {hex(received_value)}")
-                    Command.send_handshake(bytes([received_value]), handler)
+        device_name = self._id_index.get(received_value)
+        if device_name is not None:
+            device_info = self.devices[device_name]
+            handler.log("Identified device: %s with ID: %#x", device_name, received_value)
+            
+            with self._registry_lock:
+                # Two ports answering with the same ID must not both claim the device
+                if device_info.connection_status is not _CS_NOT_CONNECTED and device_info.handler is not handler:
+                    handler.log("Device %s is already claimed on %s", device_name, device_info.port_number)
                     return
+                
+                # Update device status to in-progress; a re-claim (e.g. after the device reset)
+                # is no longer connected until it completes phase 4 again
+                device_info.connection_status = ConnectionStatus.IN_PROGRESS
+                self._connected_names.discard(device_name)
+                device_info.port_number = handler.port
+                device_info.thread = handler.thread
+                device_info.handler = handler
+                
+                # Associate this handler with the device
+                handler.set_device(device_name, device_info)
+            self._progress_event.set()
+            
+            # Phase 3: Echo back the device ID using its pre-built handshake frame
+            handler.log("Sending back device ID: %#x", received_value)
+            handler.send_raw_data(device_info.echo_frame)
+            return
         
         # Phase 4: Arduino responded with success/failure
         elif received_value == 0xAA:
             # Success confirmation
             handler.log("Received successful handshake confirmation (0xAA)")
-            if handler.device_name != "NULL":
-                device_info = self.devices[handler.device_name]
-                if device_info["connection_status"] == ConnectionStatus.IN_PROGRESS:
-                    device_info["connection_status"] = ConnectionStatus.CONNECTED
-                    handler.log(f"Handshake complete for {handler.device_name}!")
+            if handler.device_name is not None:
+                device_info = handler.device
+                with self._registry_lock:
+                    completed = device_info.connection_status is _CS_IN_PROGRESS and device_info.handler is handler
+                    if completed:
+                        device_info.connection_status = ConnectionStatus.CONNECTED
+                        self._connected_names.add(handler.device_name)
+                if completed:
+                    self._progress_event.set()
+                    handler.log("Handshake complete for %s!", handler.device_name)
                     return
-                else:
-                    handler.log(f"Device {handler.device_name} not in progress state (state: {device_info['connection_status']})")
+                handler.log("Device %s not in progress on this port (state: %s)", handler.device_name, device_info.connection_status)
             else:
                 handler.log("Received handshake confirmation but no device is associated with this handler")
         
         elif received_value == 0xFF:
             # Error confirmation
             handler.log("Received error handshake response (0xFF)")
-            if handler.device_name != "NULL":
-                device_info = self.devices[handler.device_name]
-                if device_info["connection_status"] == ConnectionStatus.IN_PROGRESS:
-                    device_info["connection_status"] = ConnectionStatus.NOT_CONNECTED
-                    handler.log(f"Handshake failed for {handler.device_name}!")
+            if handler.device_name is not None:
+                device_info = handler.device
+                with self._registry_lock:
+                    failed = device_info.connection_status is _CS_IN_PROGRESS and device_info.handler is handler
+                    if failed:
+                        device_info.connection_status = ConnectionStatus.NOT_CONNECTED
+                if failed:
+                    # Let the polling loop retry this port straight away
+                    self._last_handshake_sent.pop(handler.port, None)
+                    self._progress_event.set()
+                    handler.log("Handshake failed for %s!", handler.device_name)
                     return
         
-        handler.log(f"Unhandled handshake response: {hex(received_value)}")
-        handler.log(f"Current handler device: {handler.device_name}")
-        for device_name, device_info in self.devices.items():
-            handler.log(f"Device {device_name}: ID={hex(device_info['id'])}, Status={device_info['connection_status']}, Port={device_info['port_number']}")
+        if handler.debug:
+            handler.log("Unhandled handshake response: %#x", received_value)
+            handler.log("Current handler device: %s", handler.device_name)
+            # Dump the registry as one line rather than one write per device
+            handler.log("Registry: %s", "; ".join(
+                f"{device_name}: ID={device_info.id:#x}, Status={device_info.connection_status.name}, Port={device_info.port_number}"
+                for device_name, device_info in self.devices.items()))
+
+    def _handler_disconnected(self, handler):
+        """
+        Mark a handler's device NOT_CONNECTED after its port dropped or was closed.
+        Called from the handler (usually its reader thread), so the change is made
+        under the registry lock and wakes any discovery loop waiting on progress.
+        
+        Args:
+            handler: The SerialMessageHandler reporting the disconnect
+        """
+        device_info = handler.device
+        with self._registry_lock:
+            # Ignore a handler that no longer owns the device, e.g. one that lost the handshake to another port
+            if device_info.handler is not handler or device_info.connection_status is _CS_NOT_CONNECTED:
+                return
+            device_info.connection_status = ConnectionStatus.NOT_CONNECTED
+            self._connected_names.discard(handler.device_name)
+        self._progress_event.set()
+
+    def _remember_ports(self):
+        """Save the port of every connected device so the next discovery tries it first"""
+        if self.port_cache_file is None:
+            return
+        cache = _load_port_cache(self.port_cache_file)
+        for name, device_info in self.get_connected_devices().items():
+            cache[name] = device_info.port_number
+        _save_port_cache(self.port_cache_file, cache)
+
+    def _known_ports(self, ports):
+        """
+        Find the ports devices were last seen on
+        
+        Args:
+            ports: Ports (from serial.tools.list_ports.comports())
+            
+        Returns:
+            Set of the remembered port names that are among the given ports
+        """
+        if self.port_cache_file is None:
+            return set()
+        known = set(_load_port_cache(self.port_cache_file).values())
+        return {port.device for port in ports if port.device in known}
+
+    def _all_devices_connected(self):
+        """Check whether every managed device has completed its handshake"""
+        # Every connected device is in _connected_names, so while the set is smaller than the
+        # registry some device is still missing; this keeps the per-round check O(1)
+        if len(self._connected_names) < len(self.devices):
+            return False
+        
+        # The set can hold names of devices that dropped since, so confirm once it is full
+        for device_info in self.devices.values():
+            if device_info.connection_status is not _CS_CONNECTED:
+                return False
+        return True
+
+    def _run_discovery(self, ports, done, timeout):
+        """
+        Open a handler on each port and keep sending handshake requests until done()
+        returns True or the timeout expires. Shared by discover_devices and connect_specific_device.
+        Ports a device was remembered on are asked alone for KNOWN_PORT_HEAD_START seconds, so
+        when the devices are still there the other ports are never sent a request.
+        
+        Args:
+            ports: Ports (from serial.tools.list_ports.comports()) to open handlers on
+            done: Callable returning True once discovery can stop
+            timeout: Maximum time to spend attempting to connect (seconds)
+            
+        Yields:
+            The DeviceRecord of each device as soon as it completes its handshake
+        """
+        # Create handlers for each port, skipping ports that already belong to a connected device
+        busy_ports = {handler.port for handler in self.handlers}
+        for port in ports:
+            if port.device in busy_ports:
+                continue
+            log.debug("Checking %s...", port.device)
+            self.handlers.append(self._make_handler(port.device))
+        
+        # Thread pool so handshake writes to every port go out concurrently
+        send_pool = concurrent.futures.ThreadPoolExecutor(max_workers=len(ports))
+        reported = set(self._connected_names)  # Only report devices that connect during this run
+        known_ports = self._known_ports(ports)
+        
+        try:
+            start_time = time.time()
+            head_start_end = start_time + self.KNOWN_PORT_HEAD_START if known_ports else start_time
+            
+            while time.time() - start_time < timeout:
+                # Clear before checking so a status change after the check wakes the wait below
+                self._progress_event.clear()
+                
+                # Report devices that completed their handshake since the last check
+                for name in self._connected_names - reported:
+                    reported.add(name)
+                    yield self.devices[name]
+                
+                if done():
+                    break
+                    
+                # Collect handlers that still need a handshake request
+                active_handlers = []
+                now = time.time()
+                head_start = now < head_start_end
+                for handler in self.handlers[:]:  # Use a copy to handle potential removals
+                    # Leave the other ports alone while the remembered ones have their head start
+                    if head_start and handler.port not in known_ports:
+                        continue
+                    # Skip connected devices and ports that were asked recently
+                    if not self._needs_handshake(handler, now):
+                        continue
+                    self._last_handshake_sent[handler.port] = now
+                    active_handlers.append(handler)
+                        
+                # Send the pre-built initial handshake request frame to all of them concurrently
+                self._broadcast_handshakes(send_pool, active_handlers)
+                
+                # Wait before next attempt, waking early if any handshake makes progress
+                self._progress_event.wait(timeout=self.KNOWN_PORT_POLL_INTERVAL if head_start else 1.0)
+            
+            # Report devices that completed their handshake during the final wait
+            for name in self._connected_names - reported:
+                yield self.devices[name]
+                
+        finally:
+            send_pool.shutdown(wait=False)
 
     def discover_devices(self, timeout=30):
         """
@@ -143,78 +439,51 @@ class DeviceManager:
         Returns:
             Dictionary of discovered devices
         """
-        print("Starting device discovery...")
+        log.info("Starting device discovery...")
         
         # Reset device statuses
+        self._connected_names.clear()
         for device in self.devices:
-            self.devices[device]["connection_status"] = ConnectionStatus.NOT_CONNECTED
-            self.devices[device]["port_number"] = "NULL"
-            self.devices[device]["handler"] = None
-            self.devices[device]["thread"] = None
+            self.devices[device].connection_status = ConnectionStatus.NOT_CONNECTED
+            self.devices[device].port_number = "NULL"
+            self.devices[device].handler = None
+            self.devices[device].thread = None
         
         # Clear existing handlers
         self._cleanup_handlers()
+        self._last_handshake_sent.clear()
         
         # Get list of available COM ports
         ports = serial.tools.list_ports.comports()
         if not ports:
-            print("No COM ports found")
+            log.info("No COM ports found")
             return {}
             
-        print(f"Found {len(ports)} COM ports")
-        
-        # Create handlers for each port
-        for port in ports:
-            print(f"Checking {port.device}...")
-            handler = SerialMessageHandler(port.device, 115200, debug=True)
-            # Use a lambda to bind 'self' to the handshake_response method
-            handler.register_command(bytes([0xFF]), lambda h, p: self.send_handshake_response(h, p))
-            self.handlers.append(handler)
+        log.info("Found %d COM ports", len(ports))
         
         try:
-            # Send handshake requests to all ports
-            start_time = time.time()
-            
-            while time.time() - start_time < timeout:
-                # Check if all devices are connected
-                all_connected = True
-                for device_name, device_info in self.devices.items():
-                    if device_info["connection_status"] != ConnectionStatus.CONNECTED:
-                        all_connected = False
-                        break
-                        
-                if all_connected:
-                    print("All devices connected!")
-                    break
-                    
-                # Send handshake requests to all handlers
-                for handler in self.handlers[:]:  # Use a copy to handle potential removals
-                    # Skip handlers that are already associated with a connected device
-                    if (handler.device_name != "NULL" and 
-                        handler.device_name in self.devices and 
-                        self.devices[handler.device_name]["connection_status"] == ConnectionStatus.CONNECTED):
-                        continue
-                        
-                    # Send initial handshake request with 0x00 payload using Command.py
-                    Command.send_handshake(bytes([0x00]), handler)
+            # Send handshake requests to all ports until every device is connected
+            for device_info in self._run_discovery(ports, self._all_devices_connected, timeout):
+                log.info("%s connected on %s", device_info.device_name, device_info.port_number)
                 
-                # Wait before next attempt
-                time.sleep(1)
+            if self._all_devices_connected():
+                log.info("All devices connected!")
                 
             # Print discovery results
-            print("\nDevice Discovery Results:")
+            log.info("\nDevice Discovery Results:")
             for device_name, device_info in self.devices.items():
-                status = device_info["connection_status"].name
-                port = device_info["port_number"] if status != "NOT_CONNECTED" else "N/A"
-                print(f"{device_name}: {status} on {port}")
+                status = device_info.connection_status.name
+                port = device_info.port_number if status != "NOT_CONNECTED" else "N/A"
+                log.info("%s: %s on %s", device_name, status, port)
             
             # Close handlers for devices that weren't connected
             self._cleanup_unused_handlers()
+            self._remember_ports()
             
             return self.get_connected_devices()
                     
         except Exception as e:
-            print(f"Error during device discovery: {e}")
+            log.error("Error during device discovery: %s", e)
             # Clean up on error
             self._cleanup_handlers()
             return {}
@@ -230,80 +499,59 @@ class DeviceManager:
         Returns:
             The handler for the connected device, or None if connection failed
         """
-        print(f"Attempting to connect to {device_name}...")
+        log.info("Attempting to connect to %s...", device_name)
         
         # Check if device exists in the dictionary
         if device_name not in self.devices:
-            print(f"Error: Device '{device_name}' not found in available devices")
+            log.error("Device '%s' not found in available devices", device_name)
             return None
         
         # Check if device is already connected
         device_info = self.devices[device_name]
-        if device_info["connection_status"] == ConnectionStatus.CONNECTED and device_info["handler"]:
-            print(f"Device {device_name} is already connected")
-            return device_info["handler"]
+        if device_info.connection_status is _CS_CONNECTED and device_info.handler:
+            log.info("Device %s is already connected", device_name)
+            return device_info.handler
         
         # Reset device status
-        device_info["connection_status"] = ConnectionStatus.NOT_CONNECTED
-        device_info["port_number"] = "NULL"
-        device_info["handler"] = None
-        device_info["thread"] = None
+        self._connected_names.discard(device_name)
+        device_info.connection_status = ConnectionStatus.NOT_CONNECTED
+        device_info.port_number = "NULL"
+        device_info.handler = None
+        device_info.thread = None
         
         # Get list of available COM ports
         ports = serial.tools.list_ports.comports()
         if not ports:
-            print("No COM ports found")
+            log.info("No COM ports found")
             return None
             
-        print(f"Found {len(ports)} COM ports, searching for {device_name}...")
+        log.info("Found %d COM ports, searching for %s...", len(ports), device_name)
         
         # Clear existing handlers that aren't associated with other connected devices
         self._cleanup_unused_handlers()
+        self._last_handshake_sent.clear()
         
         try:
-            # Create handlers for each port
-            for port in ports:
-                print(f"Checking {port.device}...")
-                handler = SerialMessageHandler(port.device, 115200, debug=True)
-                # Use a lambda to bind 'self' to the handshake_response method
-                handler.register_command(bytes([0xFF]), lambda h, p: self.send_handshake_response(h, p))
-                self.handlers.append(handler)
-            
-            # Start time for timeout
-            start_time = time.time()
-            
             # Send handshake requests to all ports until we find our device
-            while time.time() - start_time < timeout:
-                # Check if our device is connected
-                if device_info["connection_status"] == ConnectionStatus.CONNECTED:
-                    print(f"Successfully connected to {device_name} on {device_info['port_number']}")
-                    break
-                    
-                # Send handshake requests to all handlers
-                for handler in self.handlers[:]:  # Use a copy to handle potential removals
-                    # Skip handlers that are already associated with a connected device
-                    if handler.device_name != "NULL" and handler.device_name != device_name:
-                        continue
-                        
-                    # Send initial handshake request with 0x00 payload
-                    Command.send_handshake(bytes([0x00]), handler)
-                
-                # Wait before next attempt
-                time.sleep(1)
+            is_connected = lambda: device_info.connection_status is _CS_CONNECTED
+            for connected_info in self._run_discovery(ports, is_connected, timeout):
+                if connected_info is device_info:
+                    log.info("Successfully connected to %s on %s", device_name, device_info.port_number)
             
             # Clean up handlers that are not for our device
             # but keep handlers for already connected devices
             self._cleanup_unused_handlers()
             
             # Check if connection was successful
-            if device_info["connection_status"] == ConnectionStatus.CONNECTED:
-                return device_info["handler"]
+            if device_info.connection_status is _CS_CONNECTED:
+                self._remember_ports()
+                return device_info.handler
             else:
-                print(f"Failed to connect to {device_name} within timeout period")
+                log.info("Failed to connect to %s within timeout period", device_name)
                 return None
                 
         except Exception as e:
-            print(f"Error during device connection: {e}")
+            log.error("Error during device connection: %s", e)
             self._cleanup_handlers()
             return None
 
@@ -317,47 +565,49 @@ class DeviceManager:
         Returns:
             bool: True if successfully disconnected, False otherwise
         """
-        print(f"Disconnecting {device_name}...")
+        log.info("Disconnecting %s...", device_name)
         
         # Check if device exists in the dictionary
         if device_name not in self.devices:
-            print(f"Error: Device '{device_name}' not found in available devices")
+            log.error("Device '%s' not found in available devices", device_name)
             return False
         
         device_info = self.devices[device_name]
         
         # Check if device is connected
-        if device_info["connection_status"] != ConnectionStatus.CONNECTED:
-            print(f"Device {device_name} is not connected")
+        if device_info.connection_status is not _CS_CONNECTED:
+            log.info("Device %s is not connected", device_name)
             return False
         
         # Stop the device handler
-        if device_info["handler"]:
+        if device_info.handler:
             try:
-                print(f"Stopping connection to {device_name}...")
-                success = device_info["handler"].stop_thread(timeout=5.0)
+                log.info("Stopping connection to %s...", device_name)
+                success = device_info.handler.stop_thread(timeout=5.0)
                 
                 # Update device status
-                device_info["connection_status"] = ConnectionStatus.NOT_CONNECTED
-                device_info["port_number"] = "NULL"
-                device_info["handler"] = None
-                device_info["thread"] = None
+                self._connected_names.discard(device_name)
+                device_info.connection_status = ConnectionStatus.NOT_CONNECTED
+                device_info.port_number = "NULL"
+                device_info.handler = None
+                device_info.thread = None
                 
                 if success:
-                    print(f"Successfully disconnected {device_name}")
+                    log.info("Successfully disconnected %s", device_name)
                 else:
-                    print(f"Warning: Thread for {device_name} may still be running")
+                    log.warning("Thread for %s may still be running", device_name)
                     
                 return success
             except Exception as e:
-                print(f"Error disconnecting {device_name}: {e}")
+                log.error("Error disconnecting %s: %s", device_name, e)
                 return False
         else:
-            print(f"Device {device_name} has no active handler")
+            log.info("Device %s has no active handler", device_name)
             # Update status anyway
-            device_info["connection_status"] = ConnectionStatus.NOT_CONNECTED
-            device_info["port_number"] = "NULL"
-            device_info["thread"] = None
+            self._connected_names.discard(device_name)
+            device_info.connection_status = ConnectionStatus.NOT_CONNECTED
+            device_info.port_number = "NULL"
+            device_info.thread = None
             return True
     
     def disconnect_all_devices(self):
@@ -367,11 +617,14 @@ class DeviceManager:
         Returns:
             bool: True if all devices were successfully disconnected
         """
+        connected = [name for name, device_info in self.devices.items()
+                     if device_info.connection_status is _CS_CONNECTED]
+        
+        # Each disconnect waits on its handler's thread, so stop them all at once
         success = True
-        for device_name in self.devices:
-            if self.devices[device_name]["connection_status"] == ConnectionStatus.CONNECTED:
-                if not self.disconnect_device(device_name):
-                    success = False
+        if connected:
+            with concurrent.futures.ThreadPoolExecutor(max_workers=len(connected)) as pool:
+                success = all(list(pool.map(self.disconnect_device, connected)))
         
         # Clean up any remaining handlers
         self._cleanup_handlers()
@@ -379,54 +632,50 @@ class DeviceManager:
         
     def _cleanup_handlers(self):
         """Close and remove all handlers"""
-        for handler in self.handlers[:]:  # Use a copy of the list since we'll be modifying it
-            try:
-                handler.close_connection()
-            except Exception as e:
-                print(f"Error closing handler: {e}")
-            
-            # Remove from our list
-            if handler in self.handlers:
-                self.handlers.remove(handler)
+        self._close_handlers(self.handlers)
+        self.handlers.clear()
     
     def _cleanup_unused_handlers(self):
         """Close and remove handlers that aren't associated with connected devices"""
-        for handler in self.handlers[:]:  # Use a copy of the list since we'll be modifying it
+        # Rebuild the list in one pass rather than removing handlers one at a time
+        kept = []
+        unused = []
+        for handler in self.handlers:
             # If handler isn't associated with a device or device isn't connected, close it
-            if (handler.device_name == "NULL" or 
+            if (handler.device_name is None or 
                 handler.device_name not in self.devices or 
-                self.devices[handler.device_name]["connection_status"] != ConnectionStatus.CONNECTED):
-                try:
-                    handler.close_connection()
-                except Exception as e:
-                    print(f"Error closing handler: {e}")
-                
-                # Remove from our list
-                if handler in self.handlers:
-                    self.handlers.remove(handler)
+                self.devices[handler.device_name].connection_status is not _CS_CONNECTED):
+                unused.append(handler)
+            else:
+                kept.append(handler)
+        self.handlers = kept
+        self._close_handlers(unused)
+    
+    def _close_handlers(self, handlers):
+        """
+        Close several handlers at once. Each close waits on its thread to exit,
+        so the joins run in parallel rather than adding up port by port.
+        
+        Args:
+            handlers: The handlers to close
+        """
+        if not handlers:
+            return
+        with concurrent.futures.ThreadPoolExecutor(max_workers=len(handlers)) as pool:
+            # _close_handler reports its own errors, so every handler gets closed
+            list(pool.map(self._close_handler, handlers))
+    
+    def _close_handler(self, handler):
+        """Close a handler, reporting rather than raising any error"""
+        try:
+            handler.close_connection()
+        except Exception as e:
+            log.error("Error closing handler: %s", e)
 
 
 # Example device dictionary - can be replaced with any device configuration
 default_devices = {
-    "gpio": {
-        "id": 0x01,
-        "connection_status": ConnectionStatus.NOT_CONNECTED,
-        "port_number": "NULL",
-        "thread": None,
-        "handler": None
-    },
-    "turret": {
-        "id": 0x02,
-        "connection_status": ConnectionStatus.NOT_CONNECTED,
-        "port_number": "NULL",
-        "thread": None,
-        "handler": None
-    },
-    "led": {
-        "id": 0x03,
-        "connection_status": ConnectionStatus.NOT_CONNECTED,
-        "port_number": "NULL",
-        "thread": None,
-        "handler": None
-    },
+    "gpio": DeviceRecord(0x01, "gpio"),
+    "turret": DeviceRecord(0x02, "turret"),
+    "led": DeviceRecord(0x03, "led"),
 }
\ No newline at end of file
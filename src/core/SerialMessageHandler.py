@@ -1,8 +1,14 @@
 import serial
 import time
+import random
 import threading
 from enum import Enum
 import Globals
+import Utils
+
+# Valid frame length range: start(1) + length(1) + command(1) + checksum(1) up to the buffer size
+_MIN_LEN = 4
+_MAX_LEN = Globals.MAX_BUFFER_SIZE
 
 
 class ConnectionStatus(Enum):
@@ -22,53 +28,55 @@ class MessageState(Enum):
 class SerialMessageHandler:
     # Start byte that signifies the beginning of a message
     START_BYTE = 0xAA
+    # How long a read blocks waiting for the first byte before the loop checks for shutdown (seconds)
+    READ_TIMEOUT = 0.05
     
     def __init__(self, port, baudrate=115200, debug=False):
         self.port = port
         self.baudrate = baudrate
         self.serial_connection = None
         self.running = False
+        self._write_lock = threading.Lock()  # Keeps frames written from different threads from interleaving
         self.debug = debug
         
         # Message processing state
         self.buffer = bytearray(Globals.MAX_BUFFER_SIZE)
+        self._mv = memoryview(self.buffer)  # Zero-copy view for slice writes and checksum reads
         self.bufferIndex = 0
         self.message_state = MessageState.WAITING_FOR_START
         self.expected_length = 0
         
-        # Command handlers
-        self.command_map = {}
+        # Command handlers, indexed directly by the integer command ID
+        self.command_table = [None] * 256
         self.device = None
-        self.device_name = "NULL"
+        self.device_name = None
+        # Optional callable(handler) that marks the device NOT_CONNECTED for the owner of the device
+        # registry (e.g. DeviceManager, which takes its registry lock); without it the status is set here
+        self.on_disconnect = None
         
         # Connection management
         self.forced_disconnect = False
         self.reconnect_attempts = 0
         self.max_reconnect_attempts = 5
-        self.reconnect_delay = 2  # seconds
+        self.reconnect_delay = 2  # seconds, doubled after every failed attempt
+        self.max_reconnect_delay = 30  # seconds
         
-        # Thread management - using simple lock-protected flag for thread control
-        self._lock = threading.Lock()
-        self._thread_running = True
+        # Thread management - an Event signals the thread to stop, and waits on it wake immediately
+        self._stop = threading.Event()
         self.thread = threading.Thread(target=self.run)
         self.thread.daemon = False  # Non-daemon thread so we can join it properly
         self.thread.start()
         
     @property
     def thread_running(self):
-        """Thread-safe getter for thread_running flag"""
-        with self._lock:
-            return self._thread_running
-            
-    @thread_running.setter
-    def thread_running(self, value):
-        """Thread-safe setter for thread_running flag"""
-        with self._lock:
-            self._thread_running = value
+        """True until the thread has been asked to stop"""
+        return not self._stop.is_set()
 
-    def log(self, message):
-        """Print debug messages if debug mode is enabled"""
+    def log(self, message, *args):
+        """Print debug messages if debug mode is enabled, applying %-style args only when printing"""
         if self.debug:
+            if args:
+                message = message % args
             print(f"[{self.port}] {message}")
 
     def run(self):
@@ -76,42 +84,35 @@ class SerialMessageHandler:
         try:
             self.open_connection()
             
-            while self.thread_running:  # Using simple boolean flag
-                if not self.thread_running:
-                    break  # Double-check to ensure quick exit
-                    
+            while not self._stop.is_set():
                 if self.running:
                     try:
                         self.read_data()
                     except Exception as e:
-                        self.log(f"Error in read loop: {e}")
+                        self.log("Error in read loop: %s", e)
                         self.handle_connection_error()
                 else:
                     # If not running and not a forced disconnect, check if we should attempt reconnection
-                    if not self.forced_disconnect and self.reconnect_attempts < self.max_reconnect_attempts and self.thread_running:
-                        time.sleep(0.1)  # Shorter sleep to check thread_running more frequently
-                        if not self.thread_running:
-                            break  # Check again after sleep
+                    if not self.forced_disconnect and self.reconnect_attempts < self.max_reconnect_attempts:
+                        # Exponential back-off with full jitter so handlers that lost their ports together
+                        # (e.g. a USB hub glitch) spread their retries out instead of firing in lockstep
+                        delay = random.uniform(0, min(self.max_reconnect_delay, self.reconnect_delay * 2 ** self.reconnect_attempts))
+                        if not self.wait_while_running(delay):
+                            break  # Stopped while waiting
                             
                         self.reconnect_attempts += 1
                         self.log(f"Attempting reconnection {self.reconnect_attempts}/{self.max_reconnect_attempts}")
                         self.open_connection()
                     else:
-                        # Sleep to avoid CPU spinning, but in smaller chunks with exit checks
-                        for _ in range(10):  # 10 × 0.01s = 0.1s total
-                            if not self.thread_running:
-                                break
-                            time.sleep(0.01)
+                        # Nothing left to do until the thread is stopped
+                        self.wait_while_running(60)
             
             self.log(f"Thread for {self.port} is exiting normally")
         except Exception as e:
             self.log(f"Thread for {self.port} exiting due to exception: {e}")
             
             # Update device connection status if exception occurred
-            if self.device_name != "NULL" and self.device:
-                if self.device.get("connection_status", None) != ConnectionStatus.NOT_CONNECTED:
-                    self.log(f"Updating connection status for {self.device_name} to NOT_CONNECTED due to exception")
-                    self.device["connection_status"] = ConnectionStatus.NOT_CONNECTED
+            self._mark_disconnected("thread exception")
         finally:
             # Ensure connection is closed when thread exits
             if self.serial_connection and self.serial_connection.is_open:
@@ -122,11 +123,24 @@ class SerialMessageHandler:
                     pass
             self.log(f"Thread for {self.port} has exited")
 
+    def wait_while_running(self, delay):
+        """
+        Sleep for up to delay seconds, returning early if the thread is asked to stop
+        
+        Args:
+            delay: Time to wait (seconds)
+            
+        Returns:
+            bool: True if the full delay passed, False if the thread was stopped
+        """
+        return not self._stop.wait(delay)
+
     def open_connection(self):
         """Open the serial connection."""
         try:
-            self.serial_connection = serial.Serial(self.port, self.baudrate, timeout=1)
+            self.serial_connection = serial.Serial(self.port, self.baudrate, timeout=self.READ_TIMEOUT)
             self.log(f"Connected to {self.port} at {self.baudrate} baud.")
+            self.enable_low_latency()
             time.sleep(0.5)  # Short delay for connection to stabilize
             self.running = True
             self.forced_disconnect = False  # Reset forced disconnect flag on successful connection
@@ -135,6 +149,21 @@ class SerialMessageHandler:
             self.log(f"Error opening serial port {self.port}: {e}")
             self.running = False
 
+    def enable_low_latency(self):
+        """
+        Set ASYNC_LOW_LATENCY on the port so USB-serial adapters (e.g. FTDI) hand over
+        small frames immediately instead of holding them for their 16ms latency timer.
+        Only available through pyserial on Linux; other ports and platforms are left as they are.
+        """
+        set_low_latency_mode = getattr(self.serial_connection, "set_low_latency_mode", None)
+        if set_low_latency_mode is None:
+            return
+        try:
+            set_low_latency_mode(True)
+            self.log("Enabled low latency mode")
+        except (ValueError, OSError) as e:
+            self.log(f"Low latency mode not supported: {e}")
+
     def handle_connection_error(self):
         """Handle connection errors and initiate reconnection if needed"""
         if self.serial_connection and self.serial_connection.is_open:
@@ -147,20 +176,15 @@ class SerialMessageHandler:
         
         # Update device connection status if handler is associated with a device
         # and it's not already marked as disconnected
-        if self.device_name != "NULL" and self.device and not self.forced_disconnect:
-            if self.device.get("connection_status", None) != ConnectionStatus.NOT_CONNECTED:
-                self.log(f"Connection error: updating status for {self.device_name} to NOT_CONNECTED")
-                self.device["connection_status"] = ConnectionStatus.NOT_CONNECTED
+        if not self.forced_disconnect:
+            self._mark_disconnected("connection error")
 
     def close_connection(self):
         """Close the serial connection and terminate the thread."""
         self.log(f"Closing connection to {self.port}")
         
         # Update device connection status when closing connection
-        if self.device_name != "NULL" and self.device:
-            if self.device.get("connection_status", None) != ConnectionStatus.NOT_CONNECTED:
-                self.log(f"Updating connection status for {self.device_name} to NOT_CONNECTED during close")
-                self.device["connection_status"] = ConnectionStatus.NOT_CONNECTED
+        self._mark_disconnected("closing connection")
         
         # Use the dedicated thread stopping method
         success = self.stop_thread(timeout=3.0)
@@ -181,14 +205,10 @@ class SerialMessageHandler:
         self.log(f"Stopping thread for {self.port}...")
         
         # Update device connection status if this handler is associated with a device
-        if self.device_name != "NULL" and self.device:
-            # Using self.device reference instead of direct io_devices access
-            if self.device.get("connection_status", None) != ConnectionStatus.NOT_CONNECTED:
-                self.log(f"Updating connection status for {self.device_name} to NOT_CONNECTED")
-                self.device["connection_status"] = ConnectionStatus.NOT_CONNECTED
+        self._mark_disconnected("stopping thread")
         
         # Signal the thread to stop
-        self.thread_running = False
+        self._stop.set()
         self.forced_disconnect = True
         self.running = False
         
@@ -226,71 +246,89 @@ class SerialMessageHandler:
 
     def read_data(self):
         """Read data from the serial port."""
-        if not self.thread_running:
+        if self._stop.is_set():
             return  # Exit immediately if thread should stop
             
         if self.serial_connection and self.serial_connection.is_open:
             try:
-                # Check if data is available
-                if self.serial_connection.in_waiting > 0:
-                    # Read available data
-                    data = self.serial_connection.read(self.serial_connection.in_waiting)
+                # Take everything already queued in one read; when nothing is queued, block in the
+                # OS for the first byte (up to READ_TIMEOUT) instead of polling and sleeping
+                data = self.serial_connection.read(self.serial_connection.in_waiting or 1)
+                if data:
                     self.process_data(data)
-                else:
-                    # Small sleep to avoid CPU spinning when no data is available
-                    time.sleep(0.01)
             except serial.SerialException as e:
-                self.log(f"Serial exception: {e}")
+                self.log("Serial exception: %s", e)
                 # Update connection status on serial exception
-                if self.device_name != "NULL" and self.device:
-                    if self.device.get("connection_status", None) != ConnectionStatus.NOT_CONNECTED:
-                        self.log(f"Updating connection status for {self.device_name} to NOT_CONNECTED due to serial exception")
-                        self.device["connection_status"] = ConnectionStatus.NOT_CONNECTED
+                self._mark_disconnected("serial exception")
                 self.handle_connection_error()
             except Exception as e:
-                self.log(f"Error reading data: {e}")
+                self.log("Error reading data: %s", e)
                 # Update connection status on any exception
-                if self.device_name != "NULL" and self.device:
-                    if self.device.get("connection_status", None) != ConnectionStatus.NOT_CONNECTED:
-                        self.log(f"Updating connection status for {self.device_name} to NOT_CONNECTED due to error")
-                        self.device["connection_status"] = ConnectionStatus.NOT_CONNECTED
+                self._mark_disconnected("read error")
 
     def process_data(self, data):
-        """Process the received byte data using state machine approach"""
-        for byte_val in data:
-            # Process based on current state
-            if self.message_state == MessageState.WAITING_FOR_START:
-                if byte_val == self.START_BYTE:
-                    self.reset_buffer()
-                    self.add_to_buffer(byte_val)
-                    self.message_state = MessageState.WAITING_FOR_LENGTH
+        """
+        Process the received byte data. Rather than stepping the state machine once per byte,
+        the start byte is located with bytes.find and each frame body is copied into the buffer
+        as one slice. The state carries over between calls, so frames split across reads still complete.
+        """
+        # Work on locals inside the loop and store the parser state back once at the end
+        WAITING_FOR_START = MessageState.WAITING_FOR_START
+        WAITING_FOR_LENGTH = MessageState.WAITING_FOR_LENGTH
+        START_BYTE = self.START_BYTE
+        mv = self._mv
+        debug = self.debug
+        state = self.message_state
+        index = self.bufferIndex
+        expected = self.expected_length
+        
+        pos = 0
+        end = len(data)
+        while pos < end:
+            if state is WAITING_FOR_START:
+                # Skip straight to the next start byte
+                start = data.find(START_BYTE, pos)
+                if start < 0:
+                    break
+                mv[0] = START_BYTE
+                index = 1
+                state = WAITING_FOR_LENGTH
+                if debug:
                     self.log("Start byte received")
-                # Otherwise keep looking for start byte
+                pos = start + 1
             
-            elif self.message_state == MessageState.WAITING_FOR_LENGTH:
-                if self.is_valid_length(byte_val):
-                    self.add_to_buffer(byte_val)
-                    self.expected_length = byte_val
-                    self.message_state = MessageState.COLLECTING_DATA
-                    self.log(f"Valid length received: {byte_val}")
+            elif state is WAITING_FOR_LENGTH:
+                byte_val = data[pos]
+                pos += 1
+                if _MIN_LEN <= byte_val <= _MAX_LEN:
+                    mv[1] = byte_val
+                    index = 2
+                    expected = byte_val
+                    state = MessageState.COLLECTING_DATA
+                    if debug:
+                        self.log("Valid length received: %d", byte_val)
                 else:
-                    self.log(f"Invalid length received: {byte_val}")
-                    self.message_state = MessageState.WAITING_FOR_START
+                    if debug:
+                        self.log("Invalid length received: %d", byte_val)
+                    state = WAITING_FOR_START
             
-            elif self.message_state == MessageState.COLLECTING_DATA:
-                self.add_to_buffer(byte_val)
+            else:
+                # Copy as much of the rest of the frame as this read holds in one slice
+                take = min(expected - index, end - pos)
+                mv[index:index + take] = data[pos:pos + take]
+                index += take
+                pos += take
                 
                 # Check if we've collected the complete message
-                if self.bufferIndex >= self.expected_length:
-                    self.log(f"Complete message received: {[hex(b) for b in self.buffer[:self.expected_length]]}")
+                if index >= expected:
+                    if debug:
+                        self.log("Complete message received: %s", mv[:expected].hex(' '))
                     self.validate_and_process_message()
-                    self.message_state = MessageState.WAITING_FOR_START
-            
-            # Sanity check for buffer overflow
-            if self.bufferIndex >= Globals.MAX_BUFFER_SIZE:
-                self.log("Buffer overflow, resetting")
-                self.message_state = MessageState.WAITING_FOR_START
-                self.reset_buffer()
+                    state = WAITING_FOR_START
+        
+        self.message_state = state
+        self.bufferIndex = index
+        self.expected_length = expected
 
     def validate_and_process_message(self):
         """Validate checksum and process message if valid"""
@@ -298,52 +336,62 @@ class SerialMessageHandler:
         
         # Validate checksum
         received_checksum = self.buffer[length - 1]
-        calculated_checksum = self.calculate_checksum(self.buffer[:length - 1])
+        calculated_checksum = self.calculate_checksum(self._mv[:length - 1])
         
         if received_checksum == calculated_checksum:
-            command_id = bytes([self.buffer[2]])
-            # Handle empty payload case
-            payload = self.buffer[3:length - 1] if length > 4 else bytes()
+            command_id = self.buffer[2]
+            # View of the payload inside the receive buffer (empty when length is 4), so nothing is copied
+            payload = self._mv[3:length - 1]
             
-            payload_desc = payload.hex() if payload else "(empty)"
-            self.log(f"Valid message received - Command: {command_id.hex()}, Payload: {payload_desc}")
+            if self.debug:
+                payload_desc = payload.hex() if payload else "(empty)"
+                self.log("Valid message received - Command: %02x, Payload: %s", command_id, payload_desc)
             self.call_command(command_id, payload)
         else:
-            self.log(f"Checksum mismatch - Received: {hex(received_checksum)}, Calculated: {hex(calculated_checksum)}")
+            self.log("Checksum mismatch - Received: %#x, Calculated: %#x", received_checksum, calculated_checksum)
 
     def calculate_checksum(self, data):
         """Calculate XOR checksum of data bytes"""
-        checksum = 0
-        for byte in data:
-            checksum ^= byte
-        return checksum
+        return Utils.calculate_checksum(data)
 
     def is_valid_length(self, length):
         """Verify that length value is within valid range"""
-        # Minimum valid length: start(1) + length(1) + command(1) + checksum(1) = 4
-        # Maximum is the buffer size
-        return 4 <= length <= Globals.MAX_BUFFER_SIZE
+        return _MIN_LEN <= length <= _MAX_LEN
 
     def format_message(self, command_id, payload=None):
-        """Format a message according to the protocol"""
-        if not isinstance(command_id, bytes) or len(command_id) != 1:
+        """
+        Format a message according to the protocol
+        
+        Args:
+            command_id: The command ID, as an int (0-255) or a single byte
+            payload: Optional payload bytes
+            
+        Returns:
+            bytearray: The complete frame, ready to be written
+        """
+        if isinstance(command_id, bytes):
+            if len(command_id) != 1:
+                raise ValueError("Command ID must be a single byte")
+            command_id = command_id[0]
+        elif not isinstance(command_id, int) or not 0 <= command_id <= 0xFF:
             raise ValueError("Command ID must be a single byte")
             
         # Handle None payload as empty bytes
         if payload is None:
-            payload = bytes()
+            payload = b""
             
         # Calculate message length (start + length + command + payload + checksum)
         length = 3 + len(payload) + 1
         
-        # Build message
-        message = bytearray([self.START_BYTE, length])
-        message.extend(command_id)
-        message.extend(payload)
+        # Build the frame in one allocation, writing each field in place
+        message = bytearray(length)
+        message[0] = self.START_BYTE
+        message[1] = length
+        message[2] = command_id
+        message[3:length - 1] = payload
         
-        # Calculate and append checksum
-        checksum = self.calculate_checksum(message)
-        message.append(checksum)
+        # Checksum covers everything before the last byte; read it through a view rather than a copy
+        message[length - 1] = self.calculate_checksum(memoryview(message)[:length - 1])
         
         return message
 
@@ -353,26 +401,22 @@ class SerialMessageHandler:
             self.log("Cannot send data - serial connection not open")
             
             # Update connection status if connection is closed
-            if self.device_name != "NULL" and self.device:
-                if self.device.get("connection_status", None) != ConnectionStatus.NOT_CONNECTED:
-                    self.log(f"Updating connection status for {self.device_name} to NOT_CONNECTED - connection closed")
-                    self.device["connection_status"] = ConnectionStatus.NOT_CONNECTED
+            self._mark_disconnected("connection closed")
             
             return False
             
         try:
             message = self.format_message(command_id, payload)
-            self.serial_connection.write(message)
-            self.log(f"Sent message: {[hex(b) for b in message]}")
+            with self._write_lock:
+                self.serial_connection.write(message)
+            if self.debug:
+                self.log("Sent message: %s", message.hex(' '))
             return True
         except Exception as e:
             self.log(f"Error sending data: {e}")
             
             # Update connection status on send error
-            if self.device_name != "NULL" and self.device:
-                if self.device.get("connection_status", None) != ConnectionStatus.NOT_CONNECTED:
-                    self.log(f"Updating connection status for {self.device_name} to NOT_CONNECTED due to send error")
-                    self.device["connection_status"] = ConnectionStatus.NOT_CONNECTED
+            self._mark_disconnected("send error")
                     
             self.handle_connection_error()
             return False
@@ -383,59 +427,77 @@ class SerialMessageHandler:
             self.log("Cannot send raw data - serial connection not open")
             
             # Update connection status if connection is closed
-            if self.device_name != "NULL" and self.device:
-                if self.device.get("connection_status", None) != ConnectionStatus.NOT_CONNECTED:
-                    self.log(f"Updating connection status for {self.device_name} to NOT_CONNECTED - connection closed")
-                    self.device["connection_status"] = ConnectionStatus.NOT_CONNECTED
+            self._mark_disconnected("connection closed")
                     
             return False
             
         try:
-            self.serial_connection.write(data)
-            self.log(f"Sent raw data: {[hex(b) for b in data]}")
+            with self._write_lock:
+                self.serial_connection.write(data)
+            if self.debug:
+                self.log("Sent raw data: %s", data.hex(' '))
             return True
         except Exception as e:
             self.log(f"Error sending raw data: {e}")
             
             # Update connection status on send error
-            if self.device_name != "NULL" and self.device:
-                if self.device.get("connection_status", None) != ConnectionStatus.NOT_CONNECTED:
-                    self.log(f"Updating connection status for {self.device_name} to NOT_CONNECTED due to send error")
-                    self.device["connection_status"] = ConnectionStatus.NOT_CONNECTED
+            self._mark_disconnected("send error")
                     
             self.handle_connection_error()
             return False
     
     def register_command(self, command_id, handler_function):
-        """Register a function to handle a specific command ID"""
-        if not isinstance(command_id, bytes) or len(command_id) != 1:
+        """
+        Register a function to handle a specific command ID.
+        
+        The handler is called as handler_function(handler, payload), where payload is a
+        memoryview into the receive buffer. The buffer is reused for the next frame, so a
+        handler that keeps the payload past its return must copy it first (bytes(payload)).
+        
+        Args:
+            command_id: The command ID, as an int (0-255) or a single byte
+            handler_function: The function to call for this command
+        """
+        if isinstance(command_id, bytes):
+            if len(command_id) != 1:
+                raise ValueError("Command ID must be a single byte")
+            command_id = command_id[0]
+        elif not isinstance(command_id, int) or not 0 <= command_id <= 0xFF:
             raise ValueError("Command ID must be a single byte")
         
         if not callable(handler_function):
             raise ValueError("Handler must be a callable function")
         
-        self.command_map[command_id] = handler_function
-        self.log(f"Registered handler for command: {command_id.hex()}")
+        self.command_table[command_id] = handler_function
+        self.log("Registered handler for command: %02x", command_id)
 
     def call_command(self, command_id, payload):
-        """Call the registered handler for a command"""
-        handler = self.command_map.get(command_id)
+        """Call the registered handler for an integer command ID"""
+        handler = self.command_table[command_id]
         if handler:
             try:
                 handler(self, payload)
             except Exception as e:
-                self.log(f"Error in command handler: {e}")
+                self.log("Error in command handler: %s", e)
         else:
-            self.log(f"No handler registered for command: {command_id.hex()}")
+            self.log("No handler registered for command: %02x", command_id)
 
-    def add_to_buffer(self, byte_val):
-        """Add a byte to the buffer at the current index"""
-        self.buffer[self.bufferIndex] = byte_val
-        self.bufferIndex += 1
-    
-    def reset_buffer(self):
-        """Reset the buffer index to start"""
-        self.bufferIndex = 0
+    def _mark_disconnected(self, reason):
+        """
+        Mark the associated device NOT_CONNECTED, if there is one and it isn't already.
+        Goes through on_disconnect when it is set, so the registry owner sees the change.
+        
+        Args:
+            reason: Short description of the cause, shown in the debug message
+        """
+        device = self.device
+        if self.device_name is None or device is None or device.connection_status is ConnectionStatus.NOT_CONNECTED:
+            return
+        self.log("Updating connection status for %s to NOT_CONNECTED (%s)", self.device_name, reason)
+        if self.on_disconnect is not None:
+            self.on_disconnect(self)
+        else:
+            device.connection_status = ConnectionStatus.NOT_CONNECTED
 
     def set_device(self, device_name, device_info):
         """Set this handler's associated device"""
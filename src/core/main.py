@@ -1,7 +1,11 @@
+import logging
 import time
 from DeviceManager import DeviceManager, default_devices
 
 def main():
+    # DeviceManager reports progress through logging; show it as plain lines like the menu
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    
     print("Serial Message Handler")
     print("=====================")
     